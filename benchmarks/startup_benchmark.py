@@ -0,0 +1,86 @@
+# Startup benchmark for the Streamlit app.
+#
+# Measures the import time of the app's modules, each in a fresh interpreter,
+# and the time Streamlit takes to rerun the page.
+#
+# Run with:  python benchmarks/startup_benchmark.py [--runs N] [--reruns N]
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(REPO_DIR, "streamlit_app.py")
+
+MODULES = [
+    "streamlit",
+    "pandas",
+    "txplib_documenter.archive",
+    "txplib_documenter.contentful",
+    "txplib_documenter.llm",
+    "txplib_documenter.pipeline",
+    "streamlit_app",
+]
+
+IMPORT_SNIPPET = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed, "pandas" in sys.modules, "streamlit" in sys.modules)
+"""
+
+
+# Function to time importing a module in a fresh interpreter
+def time_import(module):
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+        cwd=REPO_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout.split()
+    return float(output[0]), output[1] == "True", output[2] == "True"
+
+
+# Function to time the first run and subsequent reruns of the page
+def time_reruns(reruns):
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(APP_PATH, default_timeout=60)
+
+    start = time.perf_counter()
+    app.run()
+    first_run = time.perf_counter() - start
+
+    rerun_times = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        app.run()
+        rerun_times.append(time.perf_counter() - start)
+    return first_run, rerun_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import and rerun time of the Streamlit app.")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per module import")
+    parser.add_argument("--reruns", type=int, default=20, help="page reruns to time")
+    args = parser.parse_args()
+
+    print(f"{'module':32} {'median import (ms)':>20} {'loads pandas':>14} {'loads streamlit':>17}")
+    for module in MODULES:
+        results = [time_import(module) for _ in range(args.runs)]
+        median = statistics.median(elapsed for elapsed, _, _ in results) * 1000
+        print(f"{module:32} {median:20.1f} {str(results[0][1]):>14} {str(results[0][2]):>17}")
+
+    first_run, rerun_times = time_reruns(args.reruns)
+
+    print()
+    print(f"first page run: {first_run * 1000:.1f} ms")
+    print(f"page rerun:     median {statistics.median(rerun_times) * 1000:.1f} ms, "
+          f"max {max(rerun_times) * 1000:.1f} ms over {len(rerun_times)} reruns")
+
+
+if __name__ == "__main__":
+    main()
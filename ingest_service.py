@@ -0,0 +1,356 @@
+# HTTP ingestion service for .txplib and .tpp libraries.
+#
+# Run with:  uvicorn ingest_service:app --host 0.0.0.0 --port 8000
+#
+# The service keeps no state in memory between requests: uploads and job records
+# are written to INGEST_JOB_DIR, so several replicas can run behind a load balancer
+# as long as they share that directory. Contentful and OpenAI credentials are read
+# from environment variables or .streamlit/secrets.toml; Streamlit itself is not loaded.
+#
+# Every replica runs INGEST_WORKERS worker threads that pick jobs up from the shared
+# directory. A worker claims a job by creating its next lease file (lease.1, lease.2, ...)
+# with O_EXCL, so only one worker on one replica can win it, and renews the lease while
+# the job runs. If a replica dies, its lease stops being renewed and another replica
+# claims the job again after INGEST_LEASE_SECONDS; after INGEST_MAX_ATTEMPTS the job is
+# marked failed instead. Persona uploads resume from the last step their lease saved.
+# Finished jobs, and uploads abandoned part way, are removed after
+# INGEST_JOB_RETENTION_SECONDS, after which their status URL returns 404.
+
+import contextlib
+import json
+import logging
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+
+import requests
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from txplib_documenter import archive, contentful, llm, pipeline
+
+JOB_DIR = os.environ.get("INGEST_JOB_DIR", "ingest_jobs")
+MAX_UPLOAD_SIZE = int(os.environ.get("INGEST_MAX_UPLOAD_SIZE", 100 * 1024 * 1024))
+WORKERS = int(os.environ.get("INGEST_WORKERS", 4))
+LEASE_SECONDS = float(os.environ.get("INGEST_LEASE_SECONDS", 60))
+MAX_ATTEMPTS = int(os.environ.get("INGEST_MAX_ATTEMPTS", 2))
+POLL_SECONDS = float(os.environ.get("INGEST_POLL_SECONDS", 2))
+JOB_RETENTION_SECONDS = float(os.environ.get("INGEST_JOB_RETENTION_SECONDS", 7 * 24 * 3600))
+
+REPLICA_ID = f"{socket.gethostname()}-{os.getpid()}"
+
+logger = logging.getLogger(__name__)
+
+# Set when this replica queues a job, so its workers don't wait for the next poll
+_job_queued = threading.Event()
+# When each job seen as done or failed finished, so it isn't read again before it expires
+_finished_jobs = {}
+_finished_jobs_lock = threading.Lock()
+
+
+def _job_path(job_id):
+    return os.path.join(JOB_DIR, job_id)
+
+
+# Function to write a job record atomically so readers on other replicas never see half a file
+def write_job(job_id, **fields):
+    record_path = os.path.join(_job_path(job_id), "job.json")
+    job = read_job(job_id) or {"job_id": job_id}
+    job.update(fields, updated_at=time.time())
+    tmp_path = f"{record_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(job, f)
+    os.replace(tmp_path, record_path)
+    return job
+
+
+def read_job(job_id):
+    try:
+        with open(os.path.join(_job_path(job_id), "job.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _lease_path(job_id, attempt):
+    return os.path.join(_job_path(job_id), f"lease.{attempt}")
+
+
+# Function to find the latest attempt at a job, 0 if it has never been claimed
+def current_attempt(job_id):
+    attempts = [int(name.split(".")[1]) for name in os.listdir(_job_path(job_id)) if name.startswith("lease.")]
+    return max(attempts, default=0)
+
+
+# Function to take the lease for one attempt at a job. Returns False if another worker has it.
+def claim_lease(job_id, attempt):
+    try:
+        fd = os.open(_lease_path(job_id, attempt), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w") as f:
+        f.write(REPLICA_ID)
+    return True
+
+
+def lease_expired(job_id, attempt):
+    try:
+        return time.time() - os.stat(_lease_path(job_id, attempt)).st_mtime > LEASE_SECONDS
+    except FileNotFoundError:
+        return False
+
+
+# Function to remove a job's directory and everything in it
+def remove_job(job_id):
+    shutil.rmtree(_job_path(job_id), ignore_errors=True)
+    with _finished_jobs_lock:
+        _finished_jobs.pop(job_id, None)
+
+
+# Function to tell how long ago an unqueued job's upload was last written to
+def _upload_age(job_id):
+    for path in (os.path.join(_job_path(job_id), "upload"), _job_path(job_id)):
+        try:
+            return time.time() - os.path.getmtime(path)
+        except FileNotFoundError:
+            continue
+    return 0
+
+
+# Function to claim the next job that is queued, or whose worker has stopped renewing its
+# lease. Jobs past their retention period are removed along the way.
+def claim_next_job():
+    job_ids = [job_id for job_id in os.listdir(JOB_DIR) if job_id.isalnum()]
+    with _finished_jobs_lock:
+        # Forget jobs another replica has already removed
+        for job_id in set(_finished_jobs) - set(job_ids):
+            del _finished_jobs[job_id]
+
+    for job_id in job_ids:
+        finished_at = _finished_jobs.get(job_id)
+        if finished_at is not None:
+            if time.time() - finished_at > JOB_RETENTION_SECONDS:
+                remove_job(job_id)
+            continue
+        job = read_job(job_id)
+        if job is None:
+            # Still being uploaded, unless the replica receiving it went away long ago
+            if _upload_age(job_id) > JOB_RETENTION_SECONDS:
+                remove_job(job_id)
+            continue
+        if job["status"] in ("done", "failed"):
+            with _finished_jobs_lock:
+                _finished_jobs[job_id] = job["updated_at"]
+            continue
+        attempt = current_attempt(job_id)
+        if attempt and not lease_expired(job_id, attempt):
+            continue
+        if claim_lease(job_id, attempt + 1):
+            return job_id, attempt + 1
+    return None
+
+
+# Function to renew a job's lease and save its progress until stop is set or the lease is lost
+def renew_lease(job_id, attempt, progress, stop):
+    while not stop.wait(LEASE_SECONDS / 4):
+        if current_attempt(job_id) != attempt:
+            return
+        os.utime(_lease_path(job_id, attempt))
+        write_job(job_id, progress=dict(progress))
+
+
+# Function to pick the same images the Streamlit page pre-selects: the first three of the last five
+def select_default_images(assets_data):
+    if not isinstance(assets_data, dict) or not assets_data.get("list"):
+        return []
+    return [
+        {"asset_number": img["asset_number"], "image_url": img["video_identity"]["url"]}
+        for img in assets_data["list"][-5:][:3]
+    ]
+
+
+# Function to run the Scenario Library pipeline on an uploaded .txplib file
+def ingest_scenario_library(upload_path, file_name, progress):
+    progress["Step"] = "Reading archive"
+    design_file = archive.admit_txplib_archive(upload_path)
+    design_content = archive.extract_file_from_zip(upload_path, design_file)
+    assets_content = archive.extract_file_from_zip(upload_path, "assets.txt")
+
+    design_data = archive.parse_assets_json(design_content)
+    df, table_string = archive.create_combined_table(design_data)
+    if df is None:
+        raise ValueError("The design file has no scenario details.")
+    progress["Step"] = "Describing scenario"
+    description = llm.describe_scenario(table_string)
+    # Nobody is there to shorten a generated description, so cut it to the schema's limit
+    max_length = contentful.get_field_max_length("scenarioLibrary", "description")
+    if max_length is not None:
+        description = description[:max_length]
+
+    selected_images_data = select_default_images(archive.parse_assets_json(assets_content))
+    if not selected_images_data:
+        raise ValueError("No images found in assets.txt.")
+
+    progress["Step"] = "Uploading to Contentful"
+    with open(upload_path, "rb") as raw_txplib_data:
+        response = pipeline.upload_to_contentful(raw_txplib_data, file_name, selected_images_data, description)
+    progress["Step"] = "Done"
+    return {"entry_id": response["sys"]["id"], "description": description}
+
+
+# Function to run the Persona Library pipeline on an uploaded .tpp file, resuming
+# from the steps a previous attempt recorded in progress
+def ingest_persona_library(upload_path, file_name, progress):
+    if not progress:
+        progress.update(pipeline.new_tpp_upload_status(file_name))
+    with open(upload_path, "rb") as raw_tpp_data:
+        response = pipeline.upload_tpp_library(raw_tpp_data, file_name, progress)
+    return {"entry_id": response["sys"]["id"]}
+
+
+PIPELINES = {
+    "scenario": (".txplib", ingest_scenario_library),
+    "persona": (".tpp", ingest_persona_library),
+}
+
+
+# Function to run one claimed attempt at a job while renewing its lease
+def run_job(job_id, attempt):
+    if attempt > MAX_ATTEMPTS:
+        write_job(job_id, status="failed", error=f"The job was abandoned by its worker {MAX_ATTEMPTS} time(s).")
+        os.remove(os.path.join(_job_path(job_id), "upload"))
+        return
+
+    job = write_job(job_id, status="running", attempt=attempt, replica=REPLICA_ID)
+    progress = job.get("progress", {})
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=renew_lease, args=(job_id, attempt, progress, stop), daemon=True)
+    heartbeat.start()
+
+    upload_path = os.path.join(_job_path(job_id), "upload")
+    try:
+        result = PIPELINES[job["kind"]][1](upload_path, job["file_name"], progress)
+    except Exception as e:
+        outcome = {"status": "failed", "error": str(e)}
+    else:
+        outcome = {"status": "done", "result": result}
+    stop.set()
+    heartbeat.join()
+
+    # Another replica has taken the job over, so its result is the one that counts
+    if current_attempt(job_id) != attempt:
+        logger.warning("Lost the lease on job %s during attempt %s.", job_id, attempt)
+        return
+    write_job(job_id, progress=progress, **outcome)
+    os.remove(upload_path)
+
+
+def work_on_jobs():
+    while True:
+        try:
+            claimed = claim_next_job()
+            if claimed:
+                run_job(*claimed)
+                continue
+        except Exception:
+            logger.exception("Ingestion worker failed.")
+        _job_queued.wait(POLL_SECONDS)
+        _job_queued.clear()
+
+
+# Function to stream a request body to disk without holding it in memory or blocking the event loop
+async def save_request_body(request, upload_path):
+    size = 0
+    f = await run_in_threadpool(open, upload_path, "wb")
+    try:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > MAX_UPLOAD_SIZE:
+                return False
+            await run_in_threadpool(f.write, chunk)
+    finally:
+        await run_in_threadpool(f.close)
+    return True
+
+
+async def create_job(request):
+    kind = request.path_params["kind"]
+    if kind not in PIPELINES:
+        return JSONResponse({"error": f"Unknown library type '{kind}'."}, status_code=404)
+
+    extension = PIPELINES[kind][0]
+    file_name = os.path.basename(request.query_params.get("file_name", ""))
+    if not file_name.endswith(extension):
+        return JSONResponse({"error": f"file_name must end with {extension}."}, status_code=400)
+
+    # Persona entries only depend on the file name, so they can be checked before reading the body
+    # (in a worker thread, as loading the schemas may call Contentful)
+    if kind == "persona":
+        fields = contentful.build_tpp_library_fields(contentful.PLACEHOLDER_LINK_ID, file_name)
+        try:
+            await run_in_threadpool(contentful.validate_entry, "personaLibrary", fields)
+        except contentful.EntryValidationError as e:
+            return JSONResponse({"error": str(e)}, status_code=422)
+        except requests.exceptions.RequestException as e:
+            return JSONResponse({"error": f"Could not load content type schemas from Contentful: {e}"}, status_code=503)
+
+    job_id = uuid.uuid4().hex
+    job_path = _job_path(job_id)
+    os.makedirs(job_path)
+    upload_path = os.path.join(job_path, "upload")
+    try:
+        saved = await save_request_body(request, upload_path)
+    except BaseException:
+        # The client disconnected or the write failed; don't leave half an upload behind
+        shutil.rmtree(job_path, ignore_errors=True)
+        raise
+    if not saved:
+        await run_in_threadpool(shutil.rmtree, job_path)
+        return JSONResponse({"error": f"Upload exceeds {MAX_UPLOAD_SIZE} bytes."}, status_code=413)
+
+    # Reject bad archives straight away rather than queueing them
+    if kind == "scenario":
+        try:
+            await run_in_threadpool(archive.admit_txplib_archive, upload_path)
+        except archive.ArchiveRejected as e:
+            await run_in_threadpool(shutil.rmtree, job_path)
+            return JSONResponse({"error": str(e)}, status_code=422)
+
+    await run_in_threadpool(write_job, job_id, kind=kind, file_name=file_name, status="queued", created_at=time.time())
+    _job_queued.set()
+    return JSONResponse(
+        {"job_id": job_id, "status_url": str(request.url_for("get_job", job_id=job_id))},
+        status_code=202,
+    )
+
+
+async def get_job(request):
+    job_id = request.path_params["job_id"]
+    job = await run_in_threadpool(read_job, job_id) if job_id.isalnum() else None
+    if job is None:
+        return JSONResponse({"error": "Job not found."}, status_code=404)
+    return JSONResponse(job)
+
+
+async def health(request):
+    return JSONResponse({"status": "ok"})
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    os.makedirs(JOB_DIR, exist_ok=True)
+    for _ in range(WORKERS):
+        threading.Thread(target=work_on_jobs, daemon=True).start()
+    yield
+
+
+app = Starlette(lifespan=lifespan, routes=[
+    Route("/libraries/{kind}", create_job, methods=["POST"]),
+    Route("/jobs/{job_id}", get_job, methods=["GET"], name="get_job"),
+    Route("/health", health, methods=["GET"]),
+])
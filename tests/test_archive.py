@@ -0,0 +1,95 @@
+import io
+import zipfile
+
+import pytest
+
+from txplib_documenter.archive import ArchiveRejected, admit_txplib_archive, extract_file_from_zip
+
+DESIGN = '{"days": [], "tabs": []}'
+ASSETS = '{"list": []}'
+
+
+# Function to build a .txplib archive in memory from a dict of member names to contents
+def build_archive(members, compression=zipfile.ZIP_DEFLATED):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=compression) as z:
+        for name, content in members.items():
+            z.writestr(name, content)
+    buffer.seek(0)
+    return buffer
+
+
+def valid_members(**extra):
+    return {"design id=2.txt": DESIGN, "assets.txt": ASSETS, **extra}
+
+
+def test_admits_a_valid_archive():
+    assert admit_txplib_archive(build_archive(valid_members())) == "design id=2.txt"
+
+
+def test_falls_back_to_the_older_design_file():
+    archive = build_archive({"design id=1.txt": DESIGN, "assets.txt": ASSETS})
+    assert admit_txplib_archive(archive) == "design id=1.txt"
+
+
+def test_rejects_a_file_that_is_not_a_zip():
+    with pytest.raises(ArchiveRejected, match="not a valid zip"):
+        admit_txplib_archive(io.BytesIO(b"not a zip file"))
+
+
+def test_rejects_too_many_members(monkeypatch):
+    monkeypatch.setenv("TXPLIB_MAX_ARCHIVE_MEMBERS", "3")
+    archive = build_archive(valid_members(**{f"extra {i}.txt": "" for i in range(2)}))
+    with pytest.raises(ArchiveRejected, match="contains 4 files"):
+        admit_txplib_archive(archive)
+
+
+def test_rejects_a_member_over_the_size_limit(monkeypatch):
+    monkeypatch.setenv("TXPLIB_MAX_MEMBER_SIZE", "100")
+    archive = build_archive(valid_members(**{"big.txt": "x" * 101}))
+    with pytest.raises(ArchiveRejected, match="'big.txt' is too large"):
+        admit_txplib_archive(archive)
+
+
+def test_rejects_a_total_over_the_size_limit(monkeypatch):
+    monkeypatch.setenv("TXPLIB_MAX_TOTAL_UNCOMPRESSED_SIZE", "150")
+    archive = build_archive(valid_members(**{"a.txt": "x" * 80, "b.txt": "x" * 80}))
+    with pytest.raises(ArchiveRejected, match="archive is too large"):
+        admit_txplib_archive(archive)
+
+
+def test_rejects_a_suspicious_compression_ratio():
+    archive = build_archive(valid_members(**{"bomb.txt": b"\0" * (2 * 1024 * 1024)}))
+    with pytest.raises(ArchiveRejected, match="suspicious compression ratio"):
+        admit_txplib_archive(archive)
+
+
+def test_allows_small_members_that_compress_well():
+    archive = build_archive(valid_members(**{"zeros.txt": b"\0" * (512 * 1024)}))
+    assert admit_txplib_archive(archive) == "design id=2.txt"
+
+
+def test_rejects_an_archive_without_a_design_file():
+    with pytest.raises(ArchiveRejected, match="no design file"):
+        admit_txplib_archive(build_archive({"assets.txt": ASSETS}))
+
+
+def test_rejects_an_archive_without_assets():
+    with pytest.raises(ArchiveRejected, match="no assets.txt"):
+        admit_txplib_archive(build_archive({"design id=2.txt": DESIGN}))
+
+
+def test_extracts_a_member_as_text():
+    assert extract_file_from_zip(build_archive(valid_members()), "assets.txt") == ASSETS
+
+
+def test_stops_reading_a_member_over_the_size_limit(monkeypatch):
+    archive = build_archive(valid_members())
+    monkeypatch.setenv("TXPLIB_MAX_MEMBER_SIZE", str(len(DESIGN) - 1))
+    with pytest.raises(ArchiveRejected, match="too large once uncompressed"):
+        extract_file_from_zip(archive, "design id=2.txt")
+
+
+def test_rejects_a_missing_member():
+    with pytest.raises(ArchiveRejected, match="no 'missing.txt' file"):
+        extract_file_from_zip(build_archive(valid_members()), "missing.txt")
@@ -0,0 +1,92 @@
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from txplib_documenter import llm
+
+
+# Stub of the chat completions endpoint. Prompts containing "flaky" are rate limited
+# on their first request; every request is counted per prompt.
+class StubCompletionHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["messages"][-1]["content"]
+        with self.server.lock:
+            self.server.requests[prompt] += 1
+            attempt = self.server.requests[prompt]
+
+        if "flaky" in prompt and attempt == 1:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+
+        # Slow enough that duplicate prompts overlap with the first call
+        time.sleep(0.2)
+        payload = json.dumps({
+            "choices": [{"message": {"content": f"reply to {prompt}"}}],
+            "usage": {"prompt_tokens": 3, "completion_tokens": 4, "total_tokens": 7},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubCompletionHandler)
+    server.lock = threading.Lock()
+    server.requests = Counter()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(llm, "LLM_BACKOFF_SECONDS", 0.0)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_generate_texts_retries_rate_limited_prompts(stub_server):
+    [result] = llm.generate_texts(["flaky prompt"])
+
+    assert result["error"] is None
+    assert result["text"] == "reply to flaky prompt"
+    assert result["attempts"] == 2
+    assert stub_server.requests["flaky prompt"] == 2
+
+
+def test_generate_texts_coalesces_duplicate_prompts(stub_server):
+    results = llm.generate_texts(["same prompt", "other prompt", "same prompt"])
+
+    assert [r["text"] for r in results] == ["reply to same prompt", "reply to other prompt", "reply to same prompt"]
+    assert [r["coalesced"] for r in results] == [False, False, True]
+    assert stub_server.requests == Counter({"same prompt": 1, "other prompt": 1})
+
+
+def test_generate_text_joins_a_running_call_for_the_same_prompt(stub_server):
+    replies = []
+    callers = [threading.Thread(target=lambda: replies.append(llm.generate_text("shared prompt"))) for _ in range(3)]
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join()
+
+    assert replies == ["reply to shared prompt"] * 3
+    assert stub_server.requests["shared prompt"] == 1
+
+
+def test_generate_texts_reports_usage_and_latency(stub_server):
+    [result] = llm.generate_texts(["usage prompt"])
+
+    assert result["usage"] == {"prompt_tokens": 3, "completion_tokens": 4, "total_tokens": 7}
+    assert result["latency"] >= 0.2
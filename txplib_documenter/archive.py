@@ -0,0 +1,154 @@
+import zipfile
+import json
+from txplib_documenter.config import get_setting
+
+# Limits applied to uploaded .txplib archives before anything is decompressed,
+# overridable through settings of the same name
+DEFAULT_LIMITS = {
+    "TXPLIB_MAX_ARCHIVE_MEMBERS": 1000,
+    "TXPLIB_MAX_MEMBER_SIZE": 50 * 1024 * 1024,
+    "TXPLIB_MAX_TOTAL_UNCOMPRESSED_SIZE": 200 * 1024 * 1024,
+    "TXPLIB_MAX_COMPRESSION_RATIO": 100,
+}
+COMPRESSION_RATIO_MIN_SIZE = 1024 * 1024
+
+
+# Raised when an uploaded archive fails the admission checks or its contents can't be read
+class ArchiveRejected(Exception):
+    pass
+
+
+def _limit(name):
+    return int(get_setting(name, DEFAULT_LIMITS[name]))
+
+
+def store_original_txplib_data(txplib_file):
+    # Store the original binary data of the file
+    original_file_data = txplib_file.read()
+    return original_file_data
+
+
+def store_original_txplib_file(txplib_file):
+    # Store the original file object
+    return txplib_file
+
+
+def store_raw_txplib_data(txplib_file):
+    # Read and store the raw binary data of the file
+    raw_file_data = txplib_file.read()
+    return raw_file_data
+
+
+# Function to list all files in the uploaded .txplib file (zip file)
+def list_files_in_zip(zip_file):
+    try:
+        with zipfile.ZipFile(zip_file) as z:
+            return z.namelist()
+    except zipfile.BadZipFile:
+        raise ArchiveRejected("The uploaded file is not a valid zip file.")
+
+
+# Function to check an uploaded .txplib file using only the zip central directory.
+# Nothing is decompressed; returns the name of the design file to use.
+def admit_txplib_archive(zip_file):
+    try:
+        with zipfile.ZipFile(zip_file) as z:
+            members = z.infolist()
+    except zipfile.BadZipFile:
+        raise ArchiveRejected("The uploaded file is not a valid zip file.")
+    
+    max_members = _limit("TXPLIB_MAX_ARCHIVE_MEMBERS")
+    max_member_size = _limit("TXPLIB_MAX_MEMBER_SIZE")
+    max_total_size = _limit("TXPLIB_MAX_TOTAL_UNCOMPRESSED_SIZE")
+    max_compression_ratio = _limit("TXPLIB_MAX_COMPRESSION_RATIO")
+    
+    if len(members) > max_members:
+        raise ArchiveRejected(f"The archive contains {len(members)} files (limit {max_members}).")
+    
+    total_size = 0
+    for info in members:
+        if info.file_size > max_member_size:
+            raise ArchiveRejected(f"'{info.filename}' is too large once uncompressed ({info.file_size} bytes).")
+        # Small files can compress very well legitimately, so only check the ratio of large ones
+        if info.file_size > COMPRESSION_RATIO_MIN_SIZE and info.file_size > max_compression_ratio * max(info.compress_size, 1):
+            raise ArchiveRejected(f"'{info.filename}' has a suspicious compression ratio.")
+        total_size += info.file_size
+    
+    if total_size > max_total_size:
+        raise ArchiveRejected(f"The archive is too large once uncompressed ({total_size} bytes).")
+    
+    file_list = [info.filename for info in members]
+    if "design id=2.txt" in file_list:
+        design_file = "design id=2.txt"
+    elif "design id=1.txt" in file_list:
+        design_file = "design id=1.txt"
+    else:
+        raise ArchiveRejected("The archive has no design file - please update the editor.")
+    
+    if not any("assets.txt" in name for name in file_list):
+        raise ArchiveRejected("The archive has no assets.txt file.")
+    
+    return design_file
+
+
+# Function to extract a specific file from the uploaded .txplib file (zip file).
+# The member is decompressed as a stream and rejected once it exceeds TXPLIB_MAX_MEMBER_SIZE,
+# whatever size the zip headers claim.
+def extract_file_from_zip(zip_file, target_file_name):
+    max_member_size = _limit("TXPLIB_MAX_MEMBER_SIZE")
+    try:
+        with zipfile.ZipFile(zip_file, 'r') as z:
+            for file_name in z.namelist():
+                if target_file_name in file_name:
+                    with z.open(file_name) as f:
+                        content = f.read(max_member_size + 1)
+                    if len(content) > max_member_size:
+                        raise ArchiveRejected(f"'{file_name}' is too large once uncompressed.")
+                    try:
+                        return content.decode('utf-8')
+                    except UnicodeDecodeError:
+                        raise ArchiveRejected(f"'{file_name}' is not valid UTF-8 text.")
+    except zipfile.BadZipFile:
+        raise ArchiveRejected("The uploaded file is not a valid zip file.")
+    raise ArchiveRejected(f"The archive has no '{target_file_name}' file.")
+
+
+# Function to parse JSON structure from the assets.txt content
+def parse_assets_json(file_content):
+    try:
+        data = json.loads(file_content)
+        return data
+    except json.JSONDecodeError:
+        raise ArchiveRejected("Failed to decode JSON structure from the file.")
+
+
+# Function to create a combined table and convert it to a string
+def create_combined_table(data):
+    # Check if "days" and "tabs" exist in the data
+    if "days" not in data or "tabs" not in data:
+        raise ArchiveRejected("The required 'days' or 'tabs' structures are not found in the file.")
+    
+    days = data["days"]
+    tabs = data["tabs"]
+    
+    combined_data = []
+    
+    for day in days:
+        day_name = day.get("name")
+        day_id = day.get("id")
+        
+        for tab in tabs:
+            if tab.get("day_id") == day_id:
+                tab_name = tab.get("name")
+                description = tab.get("serial", {}).get("description", "")
+                combined_data.append({"Day": day_name, "Tab Name": tab_name, "Description": description})
+    
+    if combined_data:
+        import pandas as pd  # Imported here as pandas dominates the app's import time
+        
+        df = pd.DataFrame(combined_data, columns=["Day", "Tab Name", "Description"])
+        df.index = pd.RangeIndex(start=1, stop=len(df) + 1, step=1)  # Reset index and remove number column
+        table_string = df.to_string(index=False)  # Convert the DataFrame to a string without index
+        return df, table_string
+    else:
+        return None, "No data available to display."
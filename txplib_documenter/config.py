@@ -0,0 +1,53 @@
+import functools
+import os
+import sys
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11; rely on environment variables and st.secrets
+    tomllib = None
+
+# Where Streamlit looks for secrets.toml, in order of precedence
+SECRETS_PATHS = (
+    os.path.join(".streamlit", "secrets.toml"),
+    os.path.join(os.path.expanduser("~"), ".streamlit", "secrets.toml"),
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _secrets_file():
+    if tomllib is None:
+        return {}
+    for path in SECRETS_PATHS:
+        try:
+            with open(path, "rb") as f:
+                return tomllib.load(f)
+        except FileNotFoundError:
+            continue
+    return {}
+
+
+# Function to read a setting on first use rather than at import time.
+# Environment variables take precedence; then st.secrets when running under
+# Streamlit; then .streamlit/secrets.toml, so the package can be used without
+# importing Streamlit at all.
+def get_setting(name, default=None):
+    if name in os.environ:
+        return os.environ[name]
+    if "streamlit" in sys.modules:
+        import streamlit as st
+
+        try:
+            if name in st.secrets:
+                return st.secrets[name]
+        except FileNotFoundError:
+            pass
+    return _secrets_file().get(name, default)
+
+
+# Function to read a required setting, raising KeyError if it is missing
+def require_setting(name):
+    value = get_setting(name)
+    if value is None:
+        raise KeyError(f"Missing setting '{name}'.")
+    return value
@@ -0,0 +1,644 @@
+import logging
+import requests
+import threading
+import time
+from txplib_documenter import entry_schemas, library_mirror
+from txplib_documenter.config import get_setting, require_setting
+
+logger = logging.getLogger(__name__)
+
+# Link ID used when validating entry payloads before their assets have been uploaded
+PLACEHOLDER_LINK_ID = "pending-upload"
+
+# How often the library mirror and the content type schemas are refreshed, in seconds
+MIRROR_REFRESH_INTERVAL = 60
+CONTENT_TYPE_REFRESH_INTERVAL = 3600
+
+_mirror_lock = threading.Lock()
+_mirror_sync_started_at = 0.0
+_mirror_sync_running = False
+_content_types_lock = threading.Lock()
+_content_types = None
+_content_types_loaded_at = 0.0
+
+
+# Raised when an entry payload does not match its Contentful content type
+class EntryValidationError(Exception):
+    pass
+
+
+def _library_mirror_path():
+    return get_setting("LIBRARY_MIRROR_PATH", "library_mirror.sqlite3")
+
+
+def _sync_library_mirror():
+    global _mirror_sync_running
+    try:
+        library_mirror.sync_library_mirror(
+            _library_mirror_path(),
+            require_setting('CONTENTFUL_SPACE_ID'),
+            require_setting('CONTENTFUL_ENVIRONMENT'),
+            require_setting('CONTENTFUL_DELIVERY_TOKEN'),
+        )
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Could not sync the local library mirror: {e}")
+    finally:
+        with _mirror_lock:
+            _mirror_sync_running = False
+
+
+# Function to keep the local library mirror up to date. Syncs run on a background
+# thread at most once a minute, so the caller never waits for one. Returns the mirror
+# path once the initial sync has completed, or None before that or when no delivery
+# token is configured.
+def refresh_library_mirror():
+    global _mirror_sync_started_at, _mirror_sync_running
+    if get_setting("CONTENTFUL_DELIVERY_TOKEN") is None:
+        return None
+    with _mirror_lock:
+        if not _mirror_sync_running and time.time() - _mirror_sync_started_at >= MIRROR_REFRESH_INTERVAL:
+            _mirror_sync_started_at = time.time()
+            _mirror_sync_running = True
+            threading.Thread(target=_sync_library_mirror, name="library-mirror-sync", daemon=True).start()
+    if not library_mirror.is_library_mirror_ready(_library_mirror_path()):
+        return None
+    return _library_mirror_path()
+
+
+# Function to find an existing library entry by name in the local mirror
+def find_existing_library(content_type, name):
+    mirror_path = refresh_library_mirror()
+    if mirror_path is None:
+        return None
+    return library_mirror.find_library_entry(mirror_path, content_type, name)
+
+
+# Function to find the library entry that uses the given asset as its file in the local mirror
+def find_library_by_asset(asset_id):
+    mirror_path = refresh_library_mirror()
+    if mirror_path is None:
+        return None
+    return library_mirror.find_library_entry_by_asset(mirror_path, asset_id)
+
+
+# Function to read an asset's published revision from the local mirror. Returns None
+# until the asset sync has completed or when the asset has never been published.
+def get_library_asset_revision(asset_id):
+    mirror_path = refresh_library_mirror()
+    if mirror_path is None or not library_mirror.is_library_mirror_ready(mirror_path, ("assets",)):
+        return None
+    asset = library_mirror.get_library_asset(mirror_path, asset_id)
+    return asset["revision"] if asset else None
+
+
+# Function to add a newly created library entry to the local mirror
+def record_created_library_entry(entry):
+    if get_setting("CONTENTFUL_DELIVERY_TOKEN") is not None:
+        library_mirror.record_library_entry(_library_mirror_path(), entry)
+
+
+# Function to load the cached content type schemas, re-checking Contentful at most once an hour
+def get_content_type_schemas():
+    global _content_types, _content_types_loaded_at
+    with _content_types_lock:
+        if _content_types is None or time.time() - _content_types_loaded_at > CONTENT_TYPE_REFRESH_INTERVAL:
+            _content_types = entry_schemas.load_content_types(
+                get_setting("CONTENT_TYPE_CACHE_PATH", "content_types.json"),
+                require_setting('CONTENTFUL_SPACE_ID'),
+                require_setting('CONTENTFUL_ENVIRONMENT'),
+                require_setting('CONTENTFUL_ACCESS_TOKEN'),
+            )
+            _content_types_loaded_at = time.time()
+        return _content_types
+
+
+# Function to read the longest string a content type accepts in a field
+def get_field_max_length(content_type_id, field_id):
+    content_type = get_content_type_schemas().get(content_type_id)
+    if content_type is None:
+        raise EntryValidationError(f"Content type '{content_type_id}' was not found in Contentful.")
+    return entry_schemas.field_max_length(content_type, field_id)
+
+
+# Function to validate entry fields locally before anything is sent to Contentful
+def validate_entry(content_type_id, fields):
+    content_type = get_content_type_schemas().get(content_type_id)
+    if content_type is None:
+        raise EntryValidationError(f"Content type '{content_type_id}' was not found in Contentful.")
+    errors = entry_schemas.validate_entry_fields(content_type, fields)
+    if errors:
+        raise EntryValidationError(f"Invalid {content_type_id} entry: " + " ".join(errors))
+
+
+def check_asset_processing_status(asset_id):
+    url = f"https://api.contentful.com/spaces/{require_setting('CONTENTFUL_SPACE_ID')}/environments/{require_setting('CONTENTFUL_ENVIRONMENT')}/assets/{asset_id}"
+    headers = {
+        "Authorization": f"Bearer {require_setting('CONTENTFUL_ACCESS_TOKEN')}"
+    }
+    response = requests.get(url, headers=headers)
+    
+    response.raise_for_status()
+    asset_details = response.json()
+    
+    # Check if the asset file is already processed
+    file_details = asset_details["fields"]["file"]["en-US"]
+    return "url" in file_details  # If 'url' is present, the asset is already processed
+
+
+# Function to poll an asset until Contentful has finished processing its file
+def wait_for_asset_processing(asset_id, timeout=60, interval=1):
+    deadline = time.time() + timeout
+    while not check_asset_processing_status(asset_id):
+        if time.time() > deadline:
+            raise TimeoutError(f"Asset {asset_id} was still processing after {timeout} s.")
+        time.sleep(interval)
+
+
+def create_image_asset_from_url(image_url, image_name):
+    url = f"https://api.contentful.com/spaces/{require_setting('CONTENTFUL_SPACE_ID')}/environments/{require_setting('CONTENTFUL_ENVIRONMENT')}/assets"
+    headers = {
+        "Authorization": f"Bearer {require_setting('CONTENTFUL_ACCESS_TOKEN')}",
+        "Content-Type": "application/vnd.contentful.management.v1+json"
+    }
+    asset_data = {
+        "fields": {
+            "title": {
+                "en-US": image_name
+            },
+            "file": {
+                "en-US": {
+                    "fileName": image_name,
+                    "contentType": "image/jpeg",  # Adjust content type as needed
+                    "url": image_url  # Directly use the provided URL
+                }
+            }
+        }
+    }
+    
+    response = requests.post(url, headers=headers, json=asset_data)
+    
+    # Log the response for debugging
+    logger.info("Create Image Asset Response Status Code: %s", response.status_code)
+    #logger.debug("Create Image Asset Response Content: %s", response.text)
+    
+    response.raise_for_status()
+    return response.json()["sys"]["id"]  # Return the asset ID
+
+
+def download_image_from_url(image_url):
+    response = requests.get(image_url)
+    response.raise_for_status()  # Ensure we got a valid response
+    return response.content  # Return the binary content of the image
+
+
+def upload_image_file_to_contentful(image_binary_data):
+    url = f"https://upload.contentful.com/spaces/{require_setting('CONTENTFUL_SPACE_ID')}/uploads"
+    headers = {
+        "Authorization": f"Bearer {require_setting('CONTENTFUL_ACCESS_TOKEN')}",
+        "Content-Type": "application/octet-stream"
+    }
+    
+    # Upload the binary image data
+    response = requests.post(url, headers=headers, data=image_binary_data)
+    
+    # Log the response for debugging
+    logger.info("Image File Upload Response Status Code: %s", response.status_code)
+    #logger.debug("Image File Upload Response Content: %s", response.text)
+    
+    # Raise an HTTPError if the response was unsuccessful
+    try:
+        response.raise_for_status()
+    except requests.exceptions.HTTPError as e:
+        logger.error(f"HTTP error occurred: {e}")
+        logger.error(f"Response content: {response.text}")
+        raise  # Re-raise the exception after logging
+    
+    return response.json()["sys"]["id"]  # Return the upload ID
+
+
+def create_image_asset_in_contentful(upload_id, image_name):
+    url = f"https://api.contentful.com/spaces/{require_setting('CONTENTFUL_SPACE_ID')}/environments/{require_setting('CONTENTFUL_ENVIRONMENT')}/assets"
+    headers = {
+        "Authorization": f"Bearer {require_setting('CONTENTFUL_ACCESS_TOKEN')}",
+        "Content-Type": "application/vnd.contentful.management.v1+json"
+    }
+    asset_data = {
+        "fields": {
+            "title": {
+                "en-US": image_name
+            },
+            "file": {
+                "en-US": {
+                    "fileName": image_name,
+                    "contentType": "image/jpeg",  # Adjust content type as needed
+                    "uploadFrom": {
+                        "sys": {
+                            "type": "Link",
+                            "linkType": "Upload",
+                            "id": upload_id
+                        }
+                    }
+                }
+            }
+        }
+    }
+    
+    response = requests.post(url, headers=headers, json=asset_data)
+    
+    # Print the response for debugging
+    logger.info("Create Image Asset Response Status Code: %s", response.status_code)
+    #logger.debug("Create Image Asset Response Content: %s", response.text)
+    
+    response.raise_for_status()
+    return response.json()["sys"]["id"]  # Return the asset ID
+
+
+def process_and_publish_image_asset(asset_id):
+    # Process the asset
+    process_asset(asset_id)
+    
+    # Wait for processing to complete
+    wait_for_asset_processing(asset_id)
+    
+    # Publish the asset
+    publish_asset(asset_id)
+
+
+def fetch_asset_latest_version(asset_id):
+    url = f"https://api.contentful.com/spaces/{require_setting('CONTENTFUL_SPACE_ID')}/environments/{require_setting('CONTENTFUL_ENVIRONMENT')}/assets/{asset_id}"
+    headers = {
+        "Authorization": f"Bearer {require_setting('CONTENTFUL_ACCESS_TOKEN')}"
+    }
+    response = requests.get(url, headers=headers)
+    
+    # Print the response for debugging
+    logger.info("Fetch Asset Latest Version Status Code: %s", response.status_code)
+    #logger.debug("Fetch Asset Latest Version Content: %s", response.text)
+    
+    response.raise_for_status()
+    
+    asset_data = response.json()
+    return asset_data['sys']['version']
+
+
+# Function to upload an image to Contentful
+def upload_image_to_contentful(image_data):
+    url = f"https://api.contentful.com/spaces/{require_setting('CONTENTFUL_SPACE_ID')}/environments/{require_setting('CONTENTFUL_ENVIRONMENT')}/entries"
+    headers = {
+        "Authorization": f"Bearer {require_setting('CONTENTFUL_ACCESS_TOKEN')}",
+        "Content-Type": "application/vnd.contentful.management.v1+json",
+        "X-Contentful-Content-Type": "image"  # Specify the content type ID
+    }
+    data = {
+        "fields": {
+            "assetId": {
+                "en-US": image_data["asset_number"]
+            },
+            "name": {
+                "en-US": image_data["asset_number"]
+            },
+            "tags": {
+                "en-US": image_data.get("tags", "")
+            },
+            "description": {
+                "en-US": image_data.get("description", "")
+            },
+            "url": {
+                "en-US": image_data["video_identity"]["url"]
+            }
+        }
+    }
+    
+    response = requests.post(url, headers=headers, json=data)
+    
+    # Print the response for debugging
+    logger.info("Response Status Code: %s", response.status_code)
+    #logger.debug("Response Content: %s", response.text)
+    
+    # Raise an HTTPError if the response was unsuccessful
+    response.raise_for_status()
+    
+    return response.json()
+
+
+def upload_txplib_file_to_contentful(raw_file_data, file_name):
+    url = f"https://upload.contentful.com/spaces/{require_setting('CONTENTFUL_SPACE_ID')}/uploads"
+    headers = {
+        "Authorization": f"Bearer {require_setting('CONTENTFUL_ACCESS_TOKEN')}",
+        "Content-Type": "application/octet-stream"
+    }
+    
+    # Upload the raw binary file data
+    response = requests.post(url, headers=headers, data=raw_file_data)
+    
+    # Log the response for debugging
+    logger.info("File Upload Response Status Code: %s", response.status_code)
+    #logger.debug("File Upload Response Content: %s", response.text)
+    
+    response.raise_for_status()
+    return response.json()["sys"]["id"]  # Return the upload ID
+
+
+def upload_tpp_file_to_contentful(raw_file_data, file_name):
+    url = f"https://upload.contentful.com/spaces/{require_setting('CONTENTFUL_SPACE_ID')}/uploads"
+    headers = {
+        "Authorization": f"Bearer {require_setting('CONTENTFUL_ACCESS_TOKEN')}",
+        "Content-Type": "application/octet-stream"
+    }
+    
+    # Upload the raw binary file data
+    response = requests.post(url, headers=headers, data=raw_file_data)
+    
+    # Log the response for debugging
+    logger.info("File Upload Response Status Code: %s", response.status_code)
+    #logger.debug("File Upload Response Content: %s", response.text)
+    
+    response.raise_for_status()
+    return response.json()["sys"]["id"]  # Return the upload ID
+
+
+def create_tpp_asset_in_contentful(upload_id, file_name):
+    url = f"https://api.contentful.com/spaces/{require_setting('CONTENTFUL_SPACE_ID')}/environments/{require_setting('CONTENTFUL_ENVIRONMENT')}/assets"
+    headers = {
+        "Authorization": f"Bearer {require_setting('CONTENTFUL_ACCESS_TOKEN')}",
+        "Content-Type": "application/vnd.contentful.management.v1+json"
+    }
+    asset_data = {
+        "fields": {
+            "title": {
+                "en-US": file_name
+            },
+            "file": {
+                "en-US": {
+                    "fileName": file_name,
+                    "contentType": "application/zip",  # Adjust content type if necessary
+                    "uploadFrom": {
+                        "sys": {
+                            "type": "Link",
+                            "linkType": "Upload",
+                            "id": upload_id
+                        }
+                    }
+                }
+            }
+        }
+    }
+    
+    response = requests.post(url, headers=headers, json=asset_data)
+    
+    # Log the response for debugging
+    logger.info("Create Asset Response Status Code: %s", response.status_code)
+    #logger.debug("Create Asset Response Content: %s", response.text)
+    
+    response.raise_for_status()
+    return response.json()["sys"]["id"]  # Return the asset ID
+
+
+def create_txplib_asset_in_contentful(upload_id, file_name):
+    url = f"https://api.contentful.com/spaces/{require_setting('CONTENTFUL_SPACE_ID')}/environments/{require_setting('CONTENTFUL_ENVIRONMENT')}/assets"
+    headers = {
+        "Authorization": f"Bearer {require_setting('CONTENTFUL_ACCESS_TOKEN')}",
+        "Content-Type": "application/vnd.contentful.management.v1+json"
+    }
+    asset_data = {
+        "fields": {
+            "title": {
+                "en-US": file_name
+            },
+            "file": {
+                "en-US": {
+                    "fileName": file_name,
+                    "contentType": "application/zip",  # Adjust content type if necessary
+                    "uploadFrom": {
+                        "sys": {
+                            "type": "Link",
+                            "linkType": "Upload",
+                            "id": upload_id
+                        }
+                    }
+                }
+            }
+        }
+    }
+    
+    response = requests.post(url, headers=headers, json=asset_data)
+    
+    # Log the response for debugging
+    logger.info("Create Asset Response Status Code: %s", response.status_code)
+    #logger.debug("Create Asset Response Content: %s", response.text)
+    
+    response.raise_for_status()
+    return response.json()["sys"]["id"]  # Return the asset ID
+
+
+def process_and_publish_txplib_asset(asset_id):
+    # Process the asset
+    process_asset(asset_id)
+    
+    # Wait for processing to complete
+    wait_for_asset_processing(asset_id)
+    
+    # Publish the asset
+    publish_asset(asset_id)
+
+
+# Function to upload the .txplib file as an asset in Contentful
+def upload_txplib_to_contentful(txplib_file):
+    # Step 1: Upload the file as a binary file upload
+    upload_url = f"https://upload.contentful.com/spaces/{require_setting('CONTENTFUL_SPACE_ID')}/uploads"
+    upload_headers = {
+        "Authorization": f"Bearer {require_setting('CONTENTFUL_ACCESS_TOKEN')}",
+        "Content-Type": "application/octet-stream"
+    }
+    
+    # Upload the file binary data
+    upload_response = requests.post(upload_url, headers=upload_headers, data=txplib_file)
+    
+    # Print the response for debugging
+    logger.info("File Upload Response Status Code: %s", upload_response.status_code)
+    #logger.debug("File Upload Response Content: %s", upload_response.text)
+    
+    upload_response.raise_for_status()
+    upload_data = upload_response.json()
+
+    # Step 2: Create an asset using the uploaded file ID
+    url = f"https://api.contentful.com/spaces/{require_setting('CONTENTFUL_SPACE_ID')}/environments/{require_setting('CONTENTFUL_ENVIRONMENT')}/assets"
+    headers = {
+        "Authorization": f"Bearer {require_setting('CONTENTFUL_ACCESS_TOKEN')}",
+        "Content-Type": "application/vnd.contentful.management.v1+json"
+    }
+    asset_data = {
+        "fields": {
+            "title": {
+                "en-US": "Scenario Library"
+            },
+            "file": {
+                "en-US": {
+                    "fileName": "scenario_library.txplib",
+                    "contentType": "application/zip",
+                    "uploadFrom": {
+                        "sys": {
+                            "type": "Link",
+                            "linkType": "Upload",
+                            "id": upload_data["sys"]["id"]
+                        }
+                    }
+                }
+            }
+        }
+    }
+    
+    response = requests.post(url, headers=headers, json=asset_data)
+    
+    # Print the response for debugging
+    logger.info("Asset Creation Response Status Code: %s", response.status_code)
+    #logger.debug("Asset Creation Response Content: %s", response.text)
+    
+    response.raise_for_status()
+    
+    return response.json()
+
+
+def process_asset(asset_id):
+    url = f"https://api.contentful.com/spaces/{require_setting('CONTENTFUL_SPACE_ID')}/environments/{require_setting('CONTENTFUL_ENVIRONMENT')}/assets/{asset_id}/files/en-US/process"
+    headers = {
+        "Authorization": f"Bearer {require_setting('CONTENTFUL_ACCESS_TOKEN')}",
+        "Content-Type": "application/vnd.contentful.management.v1+json"
+    }
+    response = requests.put(url, headers=headers)
+    
+    # Log the response status code and content for debugging
+    logger.info("Process Asset Response Status Code: %s", response.status_code)
+    
+    # If the status code indicates no content, skip JSON parsing
+    if response.status_code == 204:
+        logger.info(f"Asset {asset_id} processed successfully. No content returned.")
+        return None
+    
+    try:
+        # Attempt to parse the response as JSON if content is expected
+        return response.json()
+    except requests.exceptions.JSONDecodeError as e:
+        logger.error(f"JSON decoding error occurred: {e}")
+        logger.error(f"Response text: {response.text}")
+        raise  # Re-raise the exception after logging
+
+
+# Function to publish the asset in Contentful
+def publish_asset(asset_id):
+    # Fetch the latest version of the asset
+    latest_version = fetch_asset_latest_version(asset_id)
+    
+    url = f"https://api.contentful.com/spaces/{require_setting('CONTENTFUL_SPACE_ID')}/environments/{require_setting('CONTENTFUL_ENVIRONMENT')}/assets/{asset_id}/published"
+    headers = {
+        "Authorization": f"Bearer {require_setting('CONTENTFUL_ACCESS_TOKEN')}",
+        "X-Contentful-Version": str(latest_version)  # Use the latest version
+    }
+    response = requests.put(url, headers=headers)
+    
+    # Print the response for debugging
+    logger.info("Publish Asset Response Status Code: %s", response.status_code)
+    #logger.debug("Publish Asset Response Content: %s", response.text)
+    
+    response.raise_for_status()
+    
+    return response.json()
+
+
+# Function to build the fields of a Scenario Library entry
+# The description is passed through as it is; validate_entry reports it if it is
+# longer than the content type allows
+def build_scenario_library_fields(asset_id, image_ids, file_name, openai_description):
+    return {
+        "name": {
+            "en-US": file_name  # Use the .txplib file name
+        },
+        "description": {
+            "en-US": openai_description
+        },
+        "file": {
+            "en-US": {
+                "sys": {
+                    "type": "Link",
+                    "linkType": "Asset",
+                    "id": asset_id
+                }
+            }
+        },
+        "gallery": {
+            "en-US": [{"sys": {"type": "Link", "linkType": "Asset", "id": img_id}} for img_id in image_ids]
+        },
+        "scenariotype": {
+            "en-US": "Facilitated"
+        }
+    }
+
+
+# Function to create a Scenario Library entry in Contentful
+def create_scenario_library_entry(asset_id, image_ids, file_name, openai_description):
+    url = f"https://api.contentful.com/spaces/{require_setting('CONTENTFUL_SPACE_ID')}/environments/{require_setting('CONTENTFUL_ENVIRONMENT')}/entries"
+    headers = {
+        "Authorization": f"Bearer {require_setting('CONTENTFUL_ACCESS_TOKEN')}",
+        "Content-Type": "application/vnd.contentful.management.v1+json",
+        "X-Contentful-Content-Type": "scenarioLibrary"  # Ensure this matches your Contentful content type ID
+    }
+    data = {
+        "fields": build_scenario_library_fields(asset_id, image_ids, file_name, openai_description)
+    }
+    
+    response = requests.post(url, headers=headers, json=data)
+    
+    # Log the response for debugging
+    logger.info("Create Scenario Library Entry Response Status Code: %s", response.status_code)
+    #logger.debug("Create Scenario Library Entry Response Content: %s", response.text)
+    
+    # Raise an HTTPError if the response was unsuccessful
+    response.raise_for_status()
+    
+    return response.json()
+
+
+# Function to create a Persona Library entry
+#def create_persona_library_entry(name, file_id):
+#    create_url = f"{base_url}/entries"
+#    payload = {
+#        "fields": {
+#            "name": {"en-US": name},
+#            "file": {"en-US": {"sys": {"type": "Link", "linkType": "Asset", "id": file_id}}}
+#        }
+#    }
+#    headers_with_type = headers.copy()
+#    headers_with_type["X-Contentful-Content-Type"] = "personaLibrary"
+#    response = requests.post(create_url, headers=headers_with_type, json=payload)
+#    return response.json()
+
+# Function to build the fields of a Persona Library entry
+def build_tpp_library_fields(asset_id, file_name):
+    return {
+        "name": {"en-US": file_name},
+        "file": {"en-US": {"sys": {"type": "Link", "linkType": "Asset", "id": asset_id}}}
+    }
+
+
+def create_tpp_library_entry(asset_id, file_name):
+    
+    url = f"https://api.contentful.com/spaces/{require_setting('CONTENTFUL_SPACE_ID')}/environments/{require_setting('CONTENTFUL_ENVIRONMENT')}/entries"
+    headers = {
+        "Authorization": f"Bearer {require_setting('CONTENTFUL_ACCESS_TOKEN')}",
+        "Content-Type": "application/vnd.contentful.management.v1+json",
+        "X-Contentful-Content-Type": "personaLibrary"  # Ensure this matches your Contentful content type ID
+    }
+    data = {
+        "fields": build_tpp_library_fields(asset_id, file_name)
+    }
+    
+    response = requests.post(url, headers=headers, json=data)
+    
+    # Log the response for debugging
+    logger.info("Create Persona Library Entry Response Status Code: %s", response.status_code)
+    #logger.debug("Create Persona Library Entry Response Content: %s", response.text)
+    
+    # Raise an HTTPError if the response was unsuccessful
+    response.raise_for_status()
+    
+    return response.json()
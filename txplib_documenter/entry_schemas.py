@@ -0,0 +1,150 @@
+import json
+import os
+import re
+import time
+import requests
+
+# Content types whose entry payloads are validated before uploading
+VALIDATED_CONTENT_TYPES = ("scenarioLibrary", "personaLibrary")
+
+# Contentful's own length limits for string fields without a size validation
+DEFAULT_MAX_LENGTHS = {"Symbol": 256, "Text": 50000}
+
+
+# Returns None when the cache is missing, unreadable or not in the expected shape
+def _read_cache(cache_path):
+    try:
+        with open(cache_path) as f:
+            cache = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if not isinstance(cache, dict) or "checked_at" not in cache or "content_types" not in cache:
+        return None
+    return cache
+
+
+def _write_cache(cache_path, cache):
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, cache_path)
+
+
+# Function to fetch the content type definitions we validate against from the Management API
+def fetch_content_types(space_id, environment, access_token):
+    url = f"https://api.contentful.com/spaces/{space_id}/environments/{environment}/content_types"
+    headers = {
+        "Authorization": f"Bearer {access_token}"
+    }
+    response = requests.get(url, headers=headers, params={"limit": 1000}, timeout=30)
+    response.raise_for_status()
+    return {
+        item["sys"]["id"]: {"version": item["sys"]["version"], "fields": item["fields"]}
+        for item in response.json()["items"]
+        if item["sys"]["id"] in VALIDATED_CONTENT_TYPES
+    }
+
+
+# Function to load content type schemas from the disk cache, refetching them from
+# Contentful once the cache is older than max_age seconds. A stale cache is used if
+# Contentful can't be reached.
+def load_content_types(cache_path, space_id, environment, access_token, max_age=3600):
+    cache = _read_cache(cache_path)
+    if cache and time.time() - cache["checked_at"] < max_age:
+        return cache["content_types"]
+
+    try:
+        content_types = fetch_content_types(space_id, environment, access_token)
+    except requests.exceptions.RequestException:
+        if cache:
+            return cache["content_types"]
+        raise
+
+    _write_cache(cache_path, {"checked_at": time.time(), "content_types": content_types})
+    return content_types
+
+
+# Function to find the longest string a field accepts: its size validation if it has
+# one, otherwise Contentful's limit for its type. Returns None for non-string fields.
+def field_max_length(content_type, field_id):
+    for field in content_type["fields"]:
+        if field["id"] == field_id:
+            for validation in field.get("validations", []):
+                if "max" in validation.get("size", {}):
+                    return validation["size"]["max"]
+            return DEFAULT_MAX_LENGTHS.get(field["type"])
+    return None
+
+
+def _check_validations(field_id, value, validations, errors):
+    for validation in validations:
+        if "size" in validation:
+            size = len(value)
+            if "min" in validation["size"] and size < validation["size"]["min"]:
+                errors.append(f"'{field_id}' is shorter than {validation['size']['min']}.")
+            if "max" in validation["size"] and size > validation["size"]["max"]:
+                errors.append(f"'{field_id}' is longer than {validation['size']['max']}.")
+        if "in" in validation and value not in validation["in"]:
+            errors.append(f"'{field_id}' must be one of {validation['in']}, not {value!r}.")
+        if "regexp" in validation and isinstance(value, str):
+            pattern = validation["regexp"]["pattern"]
+            if not re.search(pattern, value, re.IGNORECASE if "i" in validation["regexp"].get("flags", "") else 0):
+                errors.append(f"'{field_id}' does not match {pattern}.")
+
+
+def _check_value(field_id, value, field_type, link_type, errors):
+    if field_type in ("Symbol", "Text"):
+        if not isinstance(value, str):
+            errors.append(f"'{field_id}' must be a string.")
+            return False
+        if len(value) > DEFAULT_MAX_LENGTHS[field_type]:
+            errors.append(f"'{field_id}' is longer than {DEFAULT_MAX_LENGTHS[field_type]}.")
+    elif field_type == "Integer" and (not isinstance(value, int) or isinstance(value, bool)):
+        errors.append(f"'{field_id}' must be an integer.")
+        return False
+    elif field_type == "Number" and (not isinstance(value, (int, float)) or isinstance(value, bool)):
+        errors.append(f"'{field_id}' must be a number.")
+        return False
+    elif field_type == "Boolean" and not isinstance(value, bool):
+        errors.append(f"'{field_id}' must be true or false.")
+        return False
+    elif field_type == "Link":
+        sys = value.get("sys", {}) if isinstance(value, dict) else {}
+        if sys.get("type") != "Link" or sys.get("linkType") != link_type or not sys.get("id"):
+            errors.append(f"'{field_id}' must be a link to an {link_type}.")
+            return False
+    return True
+
+
+# Function to validate localized entry fields against a content type schema.
+# Returns a list of error messages, empty when the fields are valid.
+def validate_entry_fields(content_type, fields, locale="en-US"):
+    errors = []
+    schema_fields = {field["id"]: field for field in content_type["fields"]}
+
+    for field_id in fields:
+        if field_id not in schema_fields:
+            errors.append(f"Unknown field '{field_id}'.")
+
+    for field_id, field in schema_fields.items():
+        if field.get("disabled") or field.get("omitted"):
+            continue
+        value = fields.get(field_id, {}).get(locale)
+        if value is None:
+            if field.get("required"):
+                errors.append(f"'{field_id}' is required.")
+            continue
+
+        if field["type"] == "Array":
+            if not isinstance(value, list):
+                errors.append(f"'{field_id}' must be a list.")
+                continue
+            _check_validations(field_id, value, field.get("validations", []), errors)
+            items = field.get("items", {})
+            for item in value:
+                if _check_value(field_id, item, items.get("type"), items.get("linkType"), errors):
+                    _check_validations(field_id, item, items.get("validations", []), errors)
+        elif _check_value(field_id, value, field["type"], field.get("linkType"), errors):
+            _check_validations(field_id, value, field.get("validations", []), errors)
+
+    return errors
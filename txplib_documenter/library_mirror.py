@@ -0,0 +1,212 @@
+import sqlite3
+import requests
+
+# Content types mirrored from Contentful
+LIBRARY_CONTENT_TYPES = ("scenarioLibrary", "personaLibrary")
+
+# Sync API filters for each part of the mirror, each with its own delta token. Library
+# entries are synced first so name lookups work before the asset sync has finished.
+# The Sync API can't filter assets by what links to them, so every asset in the space
+# is mirrored, keeping only the columns needed for ID and revision lookups.
+SYNC_SCOPES = {
+    "scenarioLibrary": {"type": "Entry", "content_type": "scenarioLibrary"},
+    "personaLibrary": {"type": "Entry", "content_type": "personaLibrary"},
+    "assets": {"type": "Asset"},
+}
+
+# Bump when SCHEMA changes; older mirrors are dropped and synced again from scratch
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id TEXT PRIMARY KEY,
+    content_type TEXT NOT NULL,
+    name TEXT,
+    file_asset_id TEXT,
+    revision INTEGER,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_by_name ON entries (content_type, name);
+CREATE INDEX IF NOT EXISTS entries_by_file_asset ON entries (file_asset_id);
+CREATE TABLE IF NOT EXISTS assets (
+    id TEXT PRIMARY KEY,
+    file_name TEXT,
+    url TEXT,
+    revision INTEGER,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS sync_tokens (
+    scope TEXT PRIMARY KEY,
+    next_sync_url TEXT NOT NULL
+);
+"""
+
+
+# Function to open the local mirror database, creating the tables if needed
+def open_library_mirror(db_path):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        conn.executescript("DROP TABLE IF EXISTS entries; DROP TABLE IF EXISTS assets; DROP TABLE IF EXISTS sync_tokens;")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _localized(fields, field_name, locale="en-US"):
+    return fields.get(field_name, {}).get(locale)
+
+
+def _store_entry(conn, item):
+    sys = item["sys"]
+    content_type = sys["contentType"]["sys"]["id"]
+    if content_type not in LIBRARY_CONTENT_TYPES:
+        return
+    fields = item.get("fields", {})
+    file_link = _localized(fields, "file") or {}
+    # Entries from the Sync API carry their published revision; entries recorded from a
+    # Management API response have none until they are published and synced
+    conn.execute(
+        "INSERT OR REPLACE INTO entries (id, content_type, name, file_asset_id, revision, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            sys["id"],
+            content_type,
+            _localized(fields, "name"),
+            file_link.get("sys", {}).get("id"),
+            sys.get("revision"),
+            sys.get("updatedAt"),
+        ),
+    )
+
+
+def _store_asset(conn, item):
+    sys = item["sys"]
+    file_details = _localized(item.get("fields", {}), "file") or {}
+    conn.execute(
+        "INSERT OR REPLACE INTO assets (id, file_name, url, revision, updated_at) VALUES (?, ?, ?, ?, ?)",
+        (
+            sys["id"],
+            file_details.get("fileName"),
+            file_details.get("url"),
+            sys.get("revision"),
+            sys.get("updatedAt"),
+        ),
+    )
+
+
+def _apply_sync_item(conn, item):
+    item_type = item["sys"]["type"]
+    if item_type == "Entry":
+        _store_entry(conn, item)
+    elif item_type == "DeletedEntry":
+        conn.execute("DELETE FROM entries WHERE id = ?", (item["sys"]["id"],))
+    elif item_type == "Asset":
+        _store_asset(conn, item)
+    elif item_type == "DeletedAsset":
+        conn.execute("DELETE FROM assets WHERE id = ?", (item["sys"]["id"],))
+
+
+def _sync_scope(conn, headers, space_id, environment, scope):
+    row = conn.execute("SELECT next_sync_url FROM sync_tokens WHERE scope = ?", (scope,)).fetchone()
+    if row:
+        url = row["next_sync_url"]
+        params = None
+    else:
+        url = f"https://cdn.contentful.com/spaces/{space_id}/environments/{environment}/sync"
+        params = {"initial": "true", **SYNC_SCOPES[scope]}
+
+    changed = 0
+    while True:
+        response = requests.get(url, headers=headers, params=params, timeout=30)
+        response.raise_for_status()
+        page = response.json()
+
+        for item in page.get("items", []):
+            _apply_sync_item(conn, item)
+            changed += 1
+
+        if "nextPageUrl" in page:
+            url = page["nextPageUrl"]
+            params = None
+            continue
+
+        # Only persist the new token once every page has been applied
+        conn.execute(
+            "INSERT OR REPLACE INTO sync_tokens (scope, next_sync_url) VALUES (?, ?)",
+            (scope, page["nextSyncUrl"]),
+        )
+        return changed
+
+
+# Function to bring the mirror up to date using the Contentful Sync API.
+# The first call performs an initial sync of each scope in SYNC_SCOPES; later
+# calls only fetch the delta since the stored sync tokens.
+def sync_library_mirror(db_path, space_id, environment, delivery_token):
+    headers = {
+        "Authorization": f"Bearer {delivery_token}"
+    }
+    conn = open_library_mirror(db_path)
+    try:
+        changed = 0
+        for scope in SYNC_SCOPES:
+            changed += _sync_scope(conn, headers, space_id, environment, scope)
+            conn.commit()
+        return changed
+    finally:
+        conn.close()
+
+
+# Function to check whether the given scopes have completed their initial sync.
+# By default only the library entries are checked, which is all name lookups need.
+def is_library_mirror_ready(db_path, scopes=LIBRARY_CONTENT_TYPES):
+    conn = open_library_mirror(db_path)
+    try:
+        placeholders = ", ".join("?" for _ in scopes)
+        synced = conn.execute(f"SELECT COUNT(*) FROM sync_tokens WHERE scope IN ({placeholders})", scopes).fetchone()[0]
+        return synced == len(scopes)
+    finally:
+        conn.close()
+
+
+# Function to look up a library entry by content type and name
+def find_library_entry(db_path, content_type, name):
+    conn = open_library_mirror(db_path)
+    try:
+        row = conn.execute(
+            "SELECT * FROM entries WHERE content_type = ? AND name = ?",
+            (content_type, name),
+        ).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+# Function to look up the library entry whose file is the given asset
+def find_library_entry_by_asset(db_path, asset_id):
+    conn = open_library_mirror(db_path)
+    try:
+        row = conn.execute("SELECT * FROM entries WHERE file_asset_id = ?", (asset_id,)).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+# Function to look up a published asset, including its published revision
+def get_library_asset(db_path, asset_id):
+    conn = open_library_mirror(db_path)
+    try:
+        row = conn.execute("SELECT * FROM assets WHERE id = ?", (asset_id,)).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+# Function to record an entry we just created through the Management API, so
+# that lookups see it before it is published and picked up by the next sync
+def record_library_entry(db_path, entry):
+    conn = open_library_mirror(db_path)
+    try:
+        _store_entry(conn, entry)
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,158 @@
+import requests
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from txplib_documenter.config import get_setting, require_setting
+
+# Settings read on use: OPENAI_BASE_URL (point this at a local mock completion
+# server to test without calling OpenAI), LLM_TIMEOUT, LLM_CONCURRENCY and LLM_MAX_RETRIES
+LLM_BACKOFF_SECONDS = 1.0
+LLM_MAX_BACKOFF_SECONDS = 30.0
+TRANSIENT_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Completions currently running, keyed by (prompt, temperature), so identical prompts share one call
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+# One thread pool for every completion in the process, so LLM_CONCURRENCY caps the
+# total number of calls to the API however many callers there are
+_executor = None
+_executor_lock = threading.Lock()
+
+
+# Function to request a chat completion from the OpenAI API and return the full response
+def request_completion(prompt, temp=0.7):
+    url = f"{get_setting('OPENAI_BASE_URL', 'https://api.openai.com/v1')}/chat/completions"
+    headers = {
+        "Authorization": f"Bearer {require_setting('OPENAI_API_KEY')}",
+        "Content-Type": "application/json"
+    }
+    data = {
+        "model": "gpt-4o",
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": temp,
+        "max_tokens": 1000,
+        "top_p": 1.0,
+        "frequency_penalty": 0.0,
+        "presence_penalty": 0.0
+    }
+    response = requests.post(url, headers=headers, json=data, timeout=float(get_setting('LLM_TIMEOUT', 60)))
+    response.raise_for_status()
+    return response.json()
+
+
+# Function to generate text using the OpenAI API
+def generate_text(prompt, temp=0.7):
+    future, _ = _coalesced_completion(prompt, temp)
+    return future.result()["text"]
+
+
+def _is_transient(error):
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    response = getattr(error, "response", None)
+    return response is not None and response.status_code in TRANSIENT_STATUS_CODES
+
+
+def _retry_delay(error, attempt):
+    # Respect the server's Retry-After header when rate limited
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            return min(float(response.headers["Retry-After"]), LLM_MAX_BACKOFF_SECONDS)
+        except (KeyError, ValueError):
+            pass
+    return min(LLM_BACKOFF_SECONDS * 2 ** attempt, LLM_MAX_BACKOFF_SECONDS) * random.uniform(0.5, 1.0)
+
+
+# Function to run one completion, retrying transient failures with exponential backoff
+def _complete_with_retries(prompt, temp):
+    max_retries = int(get_setting("LLM_MAX_RETRIES", 4))
+    start = time.perf_counter()
+    attempt = 0
+    while True:
+        try:
+            completion = request_completion(prompt, temp)
+            break
+        except requests.exceptions.RequestException as e:
+            if attempt >= max_retries or not _is_transient(e):
+                raise
+            time.sleep(_retry_delay(e, attempt))
+            attempt += 1
+
+    return {
+        "text": completion["choices"][0]["message"]["content"],
+        "usage": completion.get("usage", {}),
+        "latency": time.perf_counter() - start,
+        "attempts": attempt + 1,
+    }
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=int(get_setting('LLM_CONCURRENCY', 8)))
+        return _executor
+
+
+def _forget_in_flight(key, future):
+    with _in_flight_lock:
+        if _in_flight.get(key) is future:
+            del _in_flight[key]
+
+
+# Function to start a completion, or join one already running for the same prompt
+def _coalesced_completion(prompt, temp):
+    key = (prompt, temp)
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        coalesced = future is not None
+        if not coalesced:
+            future = _get_executor().submit(_complete_with_retries, prompt, temp)
+            _in_flight[key] = future
+
+    if not coalesced:
+        # Outside the lock, as the callback runs immediately if the call has already finished
+        future.add_done_callback(lambda done: _forget_in_flight(key, done))
+    return future, coalesced
+
+
+# Function to generate text for a batch of prompts on the shared thread pool.
+# Returns one result per prompt, in order, with the text (or error), latency,
+# number of attempts and token usage. Results for duplicate prompts are marked
+# as coalesced: they share the first call's text, latency and usage.
+def generate_texts(prompts, temp=0.7):
+    futures = []
+    batch_futures = {}
+    for prompt in prompts:
+        if prompt in batch_futures:
+            futures.append((batch_futures[prompt], True))
+            continue
+        future, coalesced = _coalesced_completion(prompt, temp)
+        batch_futures[prompt] = future
+        futures.append((future, coalesced))
+
+    results = []
+    for prompt, (future, coalesced) in zip(prompts, futures):
+        result = {"prompt": prompt, "coalesced": coalesced, "error": None}
+        try:
+            result.update(future.result())
+        except Exception as e:
+            result.update({"text": None, "usage": {}, "latency": None, "attempts": None, "error": str(e)})
+        results.append(result)
+    return results
+
+
+def scenario_description_prompt(table_string):
+    return f"Review all the details in this text and write a short description of the scenario. ##RULES Limit output to 250 characters. Text=: {table_string}"
+
+
+# Function to ask OpenAI for a short description of a scenario table
+def describe_scenario(table_string):
+    return generate_text(scenario_description_prompt(table_string))
+
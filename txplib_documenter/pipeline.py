@@ -0,0 +1,148 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from txplib_documenter.contentful import (
+    PLACEHOLDER_LINK_ID,
+    build_scenario_library_fields,
+    build_tpp_library_fields,
+    create_image_asset_in_contentful,
+    create_scenario_library_entry,
+    create_tpp_asset_in_contentful,
+    create_tpp_library_entry,
+    create_txplib_asset_in_contentful,
+    download_image_from_url,
+    process_and_publish_image_asset,
+    process_and_publish_txplib_asset,
+    process_asset,
+    publish_asset,
+    record_created_library_entry,
+    upload_image_file_to_contentful,
+    upload_tpp_file_to_contentful,
+    upload_txplib_file_to_contentful,
+    validate_entry,
+    wait_for_asset_processing,
+)
+from txplib_documenter.config import get_setting
+
+
+# Function to create the thread pool used for concurrent .tpp uploads. The
+# PERSONA_UPLOAD_CONCURRENCY setting is the number of files uploaded at the same time.
+def create_upload_executor():
+    return ThreadPoolExecutor(max_workers=int(get_setting("PERSONA_UPLOAD_CONCURRENCY", 4)))
+
+
+def upload_to_contentful(raw_txplib_data, file_name, selected_images_data, openai_description):
+    # Step 0: Check the entry payload before spending time on uploads
+    placeholder_image_ids = [PLACEHOLDER_LINK_ID] * len(selected_images_data)
+    validate_entry("scenarioLibrary", build_scenario_library_fields(PLACEHOLDER_LINK_ID, placeholder_image_ids, file_name, openai_description))
+    
+    image_ids = []
+    
+    # Step 1: Upload each selected image to Contentful and collect their IDs
+    for img_data in selected_images_data:
+        if "image_file" in img_data:  # Check if it's an uploaded image
+            upload_id = upload_image_file_to_contentful(img_data["image_file"].read())
+            image_asset_id = create_image_asset_in_contentful(upload_id, img_data["asset_number"])
+        else:
+            image_binary_data = download_image_from_url(img_data["image_url"])
+            upload_id = upload_image_file_to_contentful(image_binary_data)
+            image_asset_id = create_image_asset_in_contentful(upload_id, img_data["asset_number"])
+        
+        process_and_publish_image_asset(image_asset_id)
+        image_ids.append(image_asset_id)
+    
+    # Step 2: Upload the raw .txplib file data as an asset in Contentful
+    upload_id = upload_txplib_file_to_contentful(raw_txplib_data, file_name)
+    txplib_asset_id = create_txplib_asset_in_contentful(upload_id, file_name)
+    
+    # Step 3: Process and publish the .txplib asset
+    process_and_publish_txplib_asset(txplib_asset_id)
+    
+    # Step 4: Create a Scenario Library entry using the file name and OpenAI description
+    scenario_response = create_scenario_library_entry(txplib_asset_id, image_ids, file_name, openai_description)
+    record_created_library_entry(scenario_response)
+    
+    return scenario_response
+
+
+# Function to create the status record for one .tpp file. upload_tpp_library fills in
+# the step it is on and the ID each step produced, so a retry can resume where it failed.
+def new_tpp_upload_status(file_name, existing_entry_id=""):
+    return {
+        "File": file_name,
+        "Status": "Pending",
+        "Step": "",
+        "Upload ID": "",
+        "Asset ID": "",
+        "Processed": False,
+        "Published": False,
+        "Entry ID": "",
+        "Existing Entry": existing_entry_id,
+        "Error": "",
+    }
+
+
+# Function to run the full Contentful pipeline for one .tpp file, skipping the steps
+# already recorded as complete in progress
+def upload_tpp_library(raw_tpp_data, file_name, progress=None):
+    if progress is None:
+        progress = new_tpp_upload_status(file_name)
+    
+    # Check the entry payload before spending time on uploads
+    progress["Step"] = "Validating entry"
+    validate_entry("personaLibrary", build_tpp_library_fields(PLACEHOLDER_LINK_ID, file_name))
+    
+    if not progress["Upload ID"]:
+        progress["Step"] = "Uploading file"
+        progress["Upload ID"] = upload_tpp_file_to_contentful(raw_tpp_data, file_name)
+    
+    if not progress["Asset ID"]:
+        progress["Step"] = "Creating asset"
+        progress["Asset ID"] = create_tpp_asset_in_contentful(progress["Upload ID"], file_name)
+    
+    if not progress["Processed"]:
+        progress["Step"] = "Processing asset"
+        process_asset(progress["Asset ID"])
+        progress["Processed"] = True
+    
+    if not progress["Published"]:
+        progress["Step"] = "Waiting for processing"
+        wait_for_asset_processing(progress["Asset ID"])
+        progress["Step"] = "Publishing asset"
+        publish_asset(progress["Asset ID"])
+        progress["Published"] = True
+    
+    progress["Step"] = "Creating entry"
+    create_response = create_tpp_library_entry(progress["Asset ID"], file_name)
+    progress["Entry ID"] = create_response["sys"]["id"]
+    record_created_library_entry(create_response)
+    progress["Step"] = "Done"
+    return create_response
+
+
+# Function to run upload_tpp_library on a worker thread, recording the outcome in the
+# status record itself so it is kept even if the page that started the upload has gone
+def _upload_tpp_library_with_status(raw_tpp_data, file_name, status):
+    try:
+        upload_tpp_library(raw_tpp_data, file_name, status)
+    except Exception as e:
+        status.update({"Status": "Failed", "Error": str(e)})
+    else:
+        status["Status"] = "Done"
+
+
+# Function to start uploading several .tpp files concurrently on the given executor.
+# Workers report their progress and outcome only through upload_status.
+def start_tpp_uploads(files, upload_status, executor):
+    for uploaded_file in files:
+        status = upload_status[uploaded_file.name]
+        status.update({"Status": "Uploading", "Error": ""})
+        executor.submit(_upload_tpp_library_with_status, uploaded_file.getvalue(), uploaded_file.name, status)
+
+
+# Function to call on_update every interval seconds until no file in upload_status is
+# still uploading. Safe to interrupt: the uploads carry on and keep their status current.
+def wait_for_tpp_uploads(upload_status, on_update, interval=0.5):
+    on_update()
+    while any(status["Status"] == "Uploading" for status in upload_status.values()):
+        time.sleep(interval)
+        on_update()